@@ -1,24 +1,55 @@
 import requests
 import json
 import os
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from dotenv import load_dotenv
+from utils import has_complete_url, json_loads
 
 # Load environment variables
 load_dotenv()
 
+# Image model and instruction used to generate clean backgrounds
+IMAGE_MODEL = "gemini-3.0-pro-image-landscape"  # Using the landscape model as default
+DEFAULT_PROMPT = "Remove all text and garbled Text from this image, keeping the background and other elements exactly the same."
+
 class APIClient:
     def __init__(self):
         """Initialize API client with environment variables."""
         self.base_url = os.getenv('IMAGE_API_BASE', 'http://localhost:8000/v1/chat/completions')
+        self.model = IMAGE_MODEL
         api_key = os.getenv('IMAGE_API_KEY', 'han1234')
         self.headers = {
             "Authorization": f"Bearer {api_key}",
             "Content-Type": "application/json"
         }
 
-    def process_image(self, image_base64, prompt="Remove all text and garbled Text from this image, keeping the background and other elements exactly the same."):
+        # Reuse connections across pages instead of a new TCP/TLS handshake per request.
+        # Pool size matches the number of worker threads in main.py.
+        # Failed connections and rate limits/transient server errors are retried with
+        # backoff, honouring any Retry-After header sent by the API. Read errors are not:
+        # a timed-out POST may still be generating (and billed), and process_page_with_retry
+        # in main.py already retries whole pages.
+        self.session = requests.Session()
+        retry = Retry(
+            total=None,
+            connect=3,
+            read=0,
+            status=3,
+            other=0,
+            backoff_factor=1,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=frozenset(['POST']),
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=6, pool_maxsize=6, max_retries=retry)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update(self.headers)
+
+    def process_image(self, image_base64, prompt=DEFAULT_PROMPT):
         data = {
-            "model": "gemini-3.0-pro-image-landscape", # Using the landscape model as default
+            "model": self.model,
             "messages": [
                 {
                     "role": "user",
@@ -41,29 +72,36 @@ class APIClient:
 
         print("[IMAGE API] Sending request to API...")
         try:
-            response = requests.post(self.base_url, headers=self.headers, json=data, stream=True)
-            
-            if response.status_code != 200:
-                print(f"[IMAGE API] Error: {response.status_code} - {response.text}")
-                return None
+            # Streamed responses hold their pooled connection until closed, so close
+            # them deterministically instead of leaving that to garbage collection
+            with self.session.post(self.base_url, json=data, stream=True, timeout=(5, 120)) as response:
+                if response.status_code != 200:
+                    print(f"[IMAGE API] Error: {response.status_code} - {response.text}")
+                    return None
 
-            full_content = ""
-            for line in response.iter_lines():
-                if line:
-                    decoded_line = line.decode('utf-8')
-                    if decoded_line.startswith("data: "):
-                        json_str = decoded_line[6:]
-                        if json_str == "[DONE]":
-                            break
-                        try:
-                            chunk = json.loads(json_str)
-                            if "choices" in chunk and len(chunk["choices"]) > 0:
-                                delta = chunk["choices"][0].get("delta", {})
-                                content = delta.get("content", "")
-                                if content:
-                                    full_content += content
-                        except json.JSONDecodeError:
-                            pass
+                full_content = ""
+                # A larger read size amortises the per-line loop over fewer socket reads
+                for line in response.iter_lines(chunk_size=8192):
+                    if not line.startswith(b"data: "):
+                        continue
+                    json_str = line[6:]
+                    if json_str == b"[DONE]":
+                        break
+                    if not json_str.startswith(b"{"):
+                        continue
+                    try:
+                        chunk = json_loads(json_str)
+                    except json.JSONDecodeError:
+                        continue
+                    if "choices" in chunk and len(chunk["choices"]) > 0:
+                        delta = chunk["choices"][0].get("delta", {})
+                        content = delta.get("content", "")
+                        if content:
+                            full_content += content
+                            # The image URL is all the caller needs; stop reading as
+                            # soon as a complete one has arrived
+                            if has_complete_url(full_content):
+                                break
             
             return full_content
 
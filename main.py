@@ -2,31 +2,52 @@ import os
 import sys
 import argparse
 import time
-import json
+import random
 import shutil
+import functools
+import sqlite3
+from io import BytesIO
 from dotenv import load_dotenv
-from pdf_processor import extract_images_from_pdf, save_images_to_pdf
-from api_client import APIClient
-from ocr_client import OCRClient
+from pdf_processor import iter_images_from_pdf_parallel, get_pdf_page_count, save_images_to_pdf, PageHandle
+from api_client import APIClient, DEFAULT_PROMPT
+from ocr_client import get_ocr_client, MERGE_CACHE_DIR
 from ppt_builder import create_ppt_from_pages
-from utils import image_to_base64, extract_url_from_text, download_image_from_url
+from utils import image_to_base64_from_path, extract_url_from_text, download_image_bytes_from_url, hash_file, png_is_complete, json_loads, json_dumps, IMAGE_FORMAT_EXTENSIONS
 
 # Load environment variables
 load_dotenv()
 
 # Constants for progress tracking
-PROGRESS_FILE = 'progress.json'
+PROGRESS_DB = '.progress.db'
 TEMP_DIR = '.temp'
+# Generated backgrounds keyed by original page content, shared across inputs
+CACHE_DIR = os.path.join(TEMP_DIR, 'cache')
+
+# Worker threads shared by OCR and image generation in Step 2
+MAX_WORKERS = 6
+
+# Longest side (in pixels) of page images uploaded to the image API; 0 uploads full size
+IMAGE_UPLOAD_MAX_DIM = int(os.getenv('IMAGE_UPLOAD_MAX_DIM', '1536'))
 
 # Progress display functions
+@functools.lru_cache(maxsize=None)
+def _progress_bar(filled_length, bar_length):
+    """Build the bar string; there are only bar_length + 1 distinct states."""
+    return '█' * filled_length + '-' * (bar_length - filled_length)
+
 def print_progress(current, total, stage="Processing", bar_length=40):
-    """Print a progress bar to the console."""
+    """Print a progress bar to the console (redrawn at most 20 times per second)."""
     if total == 0:
         return
     
+    # Skip intermediate redraws that come too quickly; always draw the final state
+    now = time.monotonic()
+    if current != total and now - print_progress._last_draw < 0.05:
+        return
+    print_progress._last_draw = now
+    
     progress = current / total
-    filled_length = int(bar_length * progress)
-    bar = '█' * filled_length + '-' * (bar_length - filled_length)
+    bar = _progress_bar(int(bar_length * progress), bar_length)
     percent = round(progress * 100, 1)
     
     sys.stdout.write(f'\r{stage}: [{bar}] {percent}% ({current}/{total})')
@@ -35,14 +56,20 @@ def print_progress(current, total, stage="Processing", bar_length=40):
     if current == total:
         sys.stdout.write('\n')
 
-def process_page_with_retry(client, img, max_retries=5):
-    """Process a single page with retry logic."""
-    img_b64 = image_to_base64(img)
+print_progress._last_draw = 0.0
+
+def process_page_with_retry(client, img_path, max_retries=5):
+    """Process a single page image file with retry logic.
+
+    Returns (raw_bytes, format) of the downloaded image, or None if all attempts fail.
+    """
+    img_b64 = image_to_base64_from_path(img_path, max_dim=IMAGE_UPLOAD_MAX_DIM)
     
     for attempt in range(max_retries):
         if attempt > 0:
             print(f"  Retry attempt {attempt}/{max_retries-1}...")
-            time.sleep(2)  # Wait 2 seconds before retry
+            # Exponential backoff (2, 4, 8, ... capped at 30s) with jitter
+            time.sleep(min(2 ** attempt, 30) + random.random())
         
         # Call API
         result_text = client.process_image(img_b64)
@@ -54,9 +81,9 @@ def process_page_with_retry(client, img, max_retries=5):
             url = extract_url_from_text(result_text)
             if url:
                 print(f"  Found image URL: {url}")
-                new_img = download_image_from_url(url)
-                if new_img:
-                    return new_img
+                result = download_image_bytes_from_url(url)
+                if result:
+                    return result
             else:
                 print("  No URL found in response.")
     
@@ -78,56 +105,106 @@ def create_temp_dirs(input_path):
     # Create subdirs for different stages
     os.makedirs(input_temp_dir, exist_ok=True)
     os.makedirs(os.path.join(input_temp_dir, 'original_images'), exist_ok=True)
-    os.makedirs(os.path.join(input_temp_dir, 'layouts'), exist_ok=True)
     os.makedirs(os.path.join(input_temp_dir, 'processed_images'), exist_ok=True)
+    os.makedirs(CACHE_DIR, exist_ok=True)
     
     return input_temp_dir
 
+def fast_rmtree(path, workers=8):
+    """Delete a directory tree, unlinking its files in parallel."""
+    files = []
+    for root, _, names in os.walk(path):
+        files.extend(os.path.join(root, name) for name in names)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(os.unlink, files))
+    # Directories are now empty; remove them bottom-up
+    for root, dirs, _ in os.walk(path, topdown=False):
+        for name in dirs:
+            os.rmdir(os.path.join(root, name))
+    os.rmdir(path)
+
+def background_cache_key(img_path, client):
+    """Cache key of a generated background: the page plus every setting that changes the result."""
+    settings = json_dumps([client.base_url, client.model, DEFAULT_PROMPT, IMAGE_UPLOAD_MAX_DIM])
+    return hash_file(img_path, extra=settings)
+
+def remove_cached_backgrounds(original_images_dir, client):
+    """Delete the cached backgrounds generated from the rendered pages of one input."""
+    removed = 0
+    if not os.path.isdir(original_images_dir):
+        return removed
+    with os.scandir(original_images_dir) as entries:
+        for entry in entries:
+            if not entry.name.endswith('.png'):
+                continue
+            cached_file = find_image_file(os.path.join(CACHE_DIR, background_cache_key(entry.path, client)))
+            if cached_file:
+                os.remove(cached_file)
+                removed += 1
+    return removed
+
+def find_image_file(base_path):
+    """Return base_path plus the extension of an existing .jpg or .png file, or None."""
+    for ext in ('.jpg', '.png'):
+        if os.path.exists(base_path + ext):
+            return base_path + ext
+    return None
+
+def connect_progress_db():
+    """Open the progress database, creating the schema on first use."""
+    conn = sqlite3.connect(PROGRESS_DB, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS progress ("
+        "input_path TEXT PRIMARY KEY, stage INTEGER, completed INTEGER, total INTEGER, updated_at REAL)"
+    )
+    return conn
+
 def save_progress(input_path, stage, completed=None, total=None):
-    """Save progress to JSON file."""
-    # Load existing progress if any
-    if os.path.exists(PROGRESS_FILE):
-        with open(PROGRESS_FILE, 'r', encoding='utf-8') as f:
-            progress = json.load(f)
-    else:
-        progress = {}
-    
-    # Update progress for this input file
-    if input_path not in progress:
-        progress[input_path] = {}
-    
-    progress[input_path]['stage'] = stage
-    if completed is not None:
-        progress[input_path]['completed'] = completed
-    if total is not None:
-        progress[input_path]['total'] = total
-    
-    # Save updated progress
-    with open(PROGRESS_FILE, 'w', encoding='utf-8') as f:
-        json.dump(progress, f, ensure_ascii=False, indent=2)
+    """Save progress to the SQLite database (one atomic upsert per call)."""
+    conn = connect_progress_db()
+    try:
+        # Keep previously stored counts when they are not given
+        conn.execute(
+            "INSERT INTO progress (input_path, stage, completed, total, updated_at) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(input_path) DO UPDATE SET stage = excluded.stage, "
+            "completed = COALESCE(excluded.completed, completed), "
+            "total = COALESCE(excluded.total, total), updated_at = excluded.updated_at",
+            (input_path, stage, completed, total, time.time())
+        )
+    finally:
+        conn.close()
 
 def load_progress(input_path):
-    """Load progress from JSON file."""
-    if not os.path.exists(PROGRESS_FILE):
+    """Load progress from the SQLite database."""
+    if not os.path.exists(PROGRESS_DB):
         return None
     
-    with open(PROGRESS_FILE, 'r', encoding='utf-8') as f:
-        progress = json.load(f)
+    conn = connect_progress_db()
+    try:
+        row = conn.execute(
+            "SELECT stage, completed, total FROM progress WHERE input_path = ?", (input_path,)
+        ).fetchone()
+    finally:
+        conn.close()
     
-    return progress.get(input_path, None)
+    if row is None:
+        return None
+    progress = {'stage': row[0]}
+    if row[1] is not None:
+        progress['completed'] = row[1]
+    if row[2] is not None:
+        progress['total'] = row[2]
+    return progress
 
 def delete_progress(input_path):
     """Delete progress for a specific input file."""
-    if os.path.exists(PROGRESS_FILE):
-        with open(PROGRESS_FILE, 'r', encoding='utf-8') as f:
-            progress = json.load(f)
-        
-        if input_path in progress:
-            del progress[input_path]
-            
-        # Save updated progress
-        with open(PROGRESS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(progress, f, ensure_ascii=False, indent=2)
+    if os.path.exists(PROGRESS_DB):
+        conn = connect_progress_db()
+        try:
+            conn.execute("DELETE FROM progress WHERE input_path = ?", (input_path,))
+        finally:
+            conn.close()
 
 def main():
     # Check if .env file exists
@@ -154,7 +231,7 @@ def main():
                         help="Skip AI image generation, use original images",
                         default=skip_image_gen_env)
     parser.add_argument("--clean", action='store_true',
-                        help="Clean all temporary files and progress for the input file")
+                        help="Clean all temporary files, cached backgrounds, cached text merges and progress for the input file")
     
     args = parser.parse_args()
     
@@ -182,9 +259,16 @@ def main():
     # Clean option handling
     if args.clean:
         print(f"Cleaning temporary files and progress for {input_path}...")
+        # Delete cached backgrounds of this input's pages so they are regenerated
+        removed = remove_cached_backgrounds(os.path.join(input_temp_dir, 'original_images'), APIClient())
+        print(f"Removed {removed} cached backgrounds")
+        # Merge results are keyed by OCR output, not by input file, so the whole merge cache is cleared
+        if os.path.exists(MERGE_CACHE_DIR):
+            fast_rmtree(MERGE_CACHE_DIR)
+            print("Removed cached text merges")
         # Delete input-specific temp dir
         if os.path.exists(input_temp_dir):
-            shutil.rmtree(input_temp_dir)
+            fast_rmtree(input_temp_dir)
         # Delete progress entry
         delete_progress(input_path)
         print("Clean completed.")
@@ -220,7 +304,7 @@ def main():
     # Check if we can resume from existing images
     original_images_dir = os.path.join(input_temp_dir, 'original_images')
     # Use natural sorting to preserve page order (1, 2, ..., 10 instead of 1, 10, 2...)
-    existing_images = [f for f in os.listdir(original_images_dir) if f.endswith('.png')]
+    existing_images = [entry.name for entry in os.scandir(original_images_dir) if entry.is_file() and entry.name.endswith('.png')]
     existing_images.sort(key=lambda x: int(''.join(filter(str.isdigit, x))))
     
     from PIL import Image, UnidentifiedImageError
@@ -233,11 +317,12 @@ def main():
         for img_file in existing_images:
             img_path = os.path.join(original_images_dir, img_file)
             try:
-                img = Image.open(img_path)
-                # Verify image is not corrupt by accessing a property
-                img.verify()
-                img = Image.open(img_path)  # Reopen after verify
-                images.append(img)
+                # A truncated PNG is missing its IEND trailer; checking it avoids a full parse
+                if not png_is_complete(img_path):
+                    raise IOError("missing IEND chunk")
+                # Image.open only reads the header; pixels are decoded later by the workers
+                with Image.open(img_path) as img:
+                    images.append(PageHandle(img_path, img.size))
             except (UnidentifiedImageError, IOError, SyntaxError) as e:
                 print(f"  ✗ Corrupt image found: {img_file}, will reextract")
                 need_reextract = True
@@ -245,84 +330,98 @@ def main():
     else:
         need_reextract = True
     
+    # Pages to extract are rendered in the background and handed to Step 2 as they
+    # become available, so OCR and image generation overlap with rendering
+    page_stream = None
     if need_reextract:
-        # Extract images from PDF
         try:
             print(f"  Extracting images from PDF...")
-            images = extract_images_from_pdf(input_path)
-            print(f"  ✓ Extracted {len(images)} pages")
-            
-            # Save extracted images for resumption
-            for i, img in enumerate(images):
-                img_path = os.path.join(original_images_dir, f'page_{i+1}.png')
-                img.save(img_path, format='PNG')
-            
-            # Save progress
-            save_progress(input_path, 1, completed=len(images), total=len(images))
+            images = [None] * get_pdf_page_count(input_path)
+            page_stream = iter_images_from_pdf_parallel(input_path, original_images_dir)
         except Exception as e:
             print(f"  ✗ Error extracting images: {e}")
             return
 
     # Initialize clients
     client = APIClient()
-    ocr_client = OCRClient() if args.output_format == 'pptx' and not args.skip_ocr else None
+    ocr_client = get_ocr_client() if args.output_format == 'pptx' and not args.skip_ocr else None
 
     # Step 2: Process pages in parallel - OCR and AI background generation (with resumption)
     print("\n[Step 2/3] Processing pages in parallel...")
+    if page_stream is not None:
+        print("  Pages are processed as soon as they are extracted")
     
     # Prepare results lists
     total_pages = len(images)
     layouts = [{"text_blocks": []} for _ in images]
     processed_images = [None] * len(images)
+    # Background cache key of each generated page, reused to spot identical slides in Step 3
+    background_keys = [None] * len(images)
     
     # Check for existing results
-    layouts_dir = os.path.join(input_temp_dir, 'layouts')
+    # Layouts are appended to a single JSON Lines file, one {"page": N, ...layout} object per line
+    layouts_file = os.path.join(input_temp_dir, 'layouts.jsonl')
+    layouts_lock = threading.Lock()
     processed_images_dir = os.path.join(input_temp_dir, 'processed_images')
     
-    existing_layouts = sorted([f for f in os.listdir(layouts_dir) if f.endswith('.json')])
-    existing_processed_images = sorted([f for f in os.listdir(processed_images_dir) if f.endswith('.png')])
+    existing_layout_pages = set()
+    layouts_need_newline = False
+    if os.path.exists(layouts_file):
+        with open(layouts_file, 'rb') as f:
+            for line in f:
+                # A line cut short by an interrupted run is skipped and its page redone
+                layouts_need_newline = not line.endswith(b'\n')
+                try:
+                    row = json_loads(line)
+                except ValueError:
+                    continue
+                page_number = row.pop('page', 0)
+                if 1 <= page_number <= total_pages:
+                    layouts[page_number - 1] = row
+                    existing_layout_pages.add(page_number)
+    
+    # Read the directory once and check pages against the set instead of stat-ing every file
+    existing_processed_images = {entry.name for entry in os.scandir(processed_images_dir) if entry.name.endswith(('.png', '.jpg'))}
     
-    # Load existing results if any
     from PIL import Image
-    pages_need_ocr = []
-    pages_need_image_gen = []
     
-    for i in range(total_pages):
+    # Load existing results for a page, or submit the work it still needs
+    def schedule_page(i):
+        """Resume or submit OCR and image generation for a single page"""
         # Load existing layout if available
-        layout_file = os.path.join(layouts_dir, f'layout_{i+1}.json')
-        if os.path.exists(layout_file):
-            with open(layout_file, 'r', encoding='utf-8') as f:
-                layouts[i] = json.load(f)
+        if i + 1 in existing_layout_pages:
             print(f"  ✗ Resuming layout for page {i+1}")
         elif ocr_client:
-            pages_need_ocr.append(i)
+            futures[executor.submit(process_ocr, i, images[i])] = 'ocr'
         
-        # Load existing processed image if available
-        processed_img_file = os.path.join(processed_images_dir, f'page_{i+1}.png')
-        if os.path.exists(processed_img_file):
-            processed_images[i] = Image.open(processed_img_file)
+        # Load existing processed image if available (stored as .jpg or .png)
+        processed_img_name = next((f'page_{i+1}{ext}' for ext in ('.jpg', '.png')
+                                   if f'page_{i+1}{ext}' in existing_processed_images), None)
+        if processed_img_name:
+            processed_images[i] = Image.open(os.path.join(processed_images_dir, processed_img_name))
             print(f"  ✗ Resuming processed image for page {i+1}")
         elif not args.skip_image_gen:
-            pages_need_image_gen.append(i)
+            futures[executor.submit(process_image_gen, i, images[i])] = 'image_gen'
     
-    # Process OCR in parallel (max 3 workers)
-    def process_ocr(index, img):
+    # Process OCR for a single page (runs in the shared worker pool)
+    def process_ocr(index, page):
         """Process OCR for a single page"""
         print(f"  OCR processing page {index+1}/{total_pages}...")
         
-        layout_file = os.path.join(layouts_dir, f'layout_{index+1}.json')
         try:
-            layout = ocr_client.extract_text_layout(img)
+            layout = ocr_client.extract_text_layout(page.load_gray())
             # Save original image dimensions in layout for coordinate mapping
-            original_width, original_height = img.size
+            original_width, original_height = page.size
             layout['original_size'] = {
                 'width': original_width,
                 'height': original_height
             }
             
             # Save layout for resumption
-            with open(layout_file, 'w', encoding='utf-8') as f:
-                json.dump(layout, f, ensure_ascii=False, indent=2)
+            line = json_dumps({'page': index + 1, **layout}) + b'\n'
+            with layouts_lock:
+                layouts_out.write(line)
+                layouts_out.flush()
             
             text_count = len(layout.get('text_blocks', []))
             print(f"  ✓ OCR completed for page {index+1} ({text_count} text blocks)")
@@ -331,62 +430,124 @@ def main():
             print(f"  ✗ OCR Error for page {index+1}: {e}")
             return index, None
     
-    # Process Image Generation in parallel (max 3 workers)
-    def process_image_gen(index, img):
+    # Process Image Generation for a single page (runs in the shared worker pool)
+    def process_image_gen(index, page):
         """Process AI image generation for a single page"""
         print(f"  Image generation processing page {index+1}/{total_pages}...")
         
-        processed_img_file = os.path.join(processed_images_dir, f'page_{index+1}.png')
+        # Reuse the background of a visually identical page processed before
+        cache_key = background_cache_key(page.path, client)
+        cached_file = find_image_file(os.path.join(CACHE_DIR, cache_key))
+        if cached_file:
+            processed_img_file = os.path.join(processed_images_dir, f'page_{index+1}' + os.path.splitext(cached_file)[1])
+            write_futures[writer_pool.submit(shutil.copyfile, cached_file, processed_img_file)] = index
+            print(f"  ✓ Reusing cached background for page {index+1}")
+            background_keys[index] = cache_key
+            return index, Image.open(cached_file)
         
         # Generate clean background
-        new_img = process_page_with_retry(client, img)
-        if not new_img:
+        result = process_page_with_retry(client, page.path)
+        if not result:
             print(f"  ✗ Image generation failed for page {index+1} after retries. Using original image.")
-            new_img = img
+            new_img = page.load()
+            write_futures[writer_pool.submit(
+                shutil.copyfile, page.path, os.path.join(processed_images_dir, f'page_{index+1}.png'))] = index
         else:
             print(f"  ✓ Image generation completed for page {index+1}")
-        
-        # Save processed image for resumption
-        new_img.save(processed_img_file, format='PNG')
+            raw_bytes, image_format = result
+            new_img = Image.open(BytesIO(raw_bytes))
+            background_keys[index] = cache_key
+            # Hand the disk writes to the writer pool so this worker can start its next page
+            write_futures[writer_pool.submit(
+                save_processed_image, index, raw_bytes, image_format, new_img, cache_key)] = index
         
         return index, new_img
     
-    # Run OCR and Image Generation in parallel if needed
-    ocr_futures = []
-    image_gen_futures = []
-    
-    # Create separate thread pools for OCR and Image Generation
-    with concurrent.futures.ThreadPoolExecutor(max_workers=3) as ocr_executor, \
-         concurrent.futures.ThreadPoolExecutor(max_workers=3) as image_executor:
+    # Save a generated background for resumption and cache it (runs in the writer pool)
+    def save_processed_image(index, raw_bytes, image_format, new_img, cache_key):
+        """Write a generated background to processed_images and the cache"""
+        ext = IMAGE_FORMAT_EXTENSIONS.get(image_format)
+        if ext:
+            # Write the downloaded bytes unchanged instead of re-encoding them
+            processed_img_file = os.path.join(processed_images_dir, f'page_{index+1}{ext}')
+            with open(processed_img_file, 'wb') as f:
+                f.write(raw_bytes)
+        else:
+            ext = '.png'
+            processed_img_file = os.path.join(processed_images_dir, f'page_{index+1}{ext}')
+            new_img.save(processed_img_file, format='PNG')
+        # Only successful generations are cached; the rename keeps partial files out of the cache.
+        # Identical pages can be written concurrently, so each writer uses its own temp file.
+        cache_file = os.path.join(CACHE_DIR, cache_key + ext)
+        temp_file = f'{cache_file}.{threading.get_ident()}.tmp'
+        try:
+            shutil.copyfile(processed_img_file, temp_file)
+            os.replace(temp_file, cache_file)
+        except OSError as e:
+            print(f"  Warning: Failed to cache background for page {index+1}: {e}")
+    
+    # Run OCR and Image Generation in one shared pool so idle workers of one kind
+    # can pick up pages of the other; each future is tagged with its task kind
+    futures = {}
+    extraction_failed = False
+    # Disk writes of processed images, kept off the page workers' critical path
+    write_futures = {}  # future -> page index
+    
+    with open(layouts_file, 'ab') as layouts_out, \
+         concurrent.futures.ThreadPoolExecutor(max_workers=2) as writer_pool, \
+         concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
         
-        # Submit OCR tasks
-        if pages_need_ocr:
-            print(f"  Starting OCR processing for {len(pages_need_ocr)} pages with 3 workers...")
-            ocr_futures = [ocr_executor.submit(process_ocr, i, images[i]) for i in pages_need_ocr]
+        # Terminate a partial last line so new layouts start on a line of their own
+        if layouts_need_newline:
+            layouts_out.write(b'\n')
         
-        # Submit Image Generation tasks
-        if pages_need_image_gen:
-            print(f"  Starting Image Generation for {len(pages_need_image_gen)} pages with 3 workers...")
-            image_gen_futures = [image_executor.submit(process_image_gen, i, images[i]) for i in pages_need_image_gen]
+        # Submit tasks for each page as soon as its image is available
+        if page_stream is None:
+            for i in range(total_pages):
+                schedule_page(i)
+        else:
+            try:
+                for i, page in page_stream:
+                    images[i] = page
+                    schedule_page(i)
+                print(f"  ✓ Extracted {total_pages} pages")
+                save_progress(input_path, 1, completed=total_pages, total=total_pages)
+            except Exception as e:
+                print(f"  ✗ Error extracting images: {e}")
+                extraction_failed = True
         
-        # Collect OCR results
-        for future in concurrent.futures.as_completed(ocr_futures):
-            index, layout = future.result()
-            if layout:
-                layouts[index] = layout
+        task_kinds = list(futures.values())
+        print(f"  Submitted {task_kinds.count('ocr')} OCR and {task_kinds.count('image_gen')} "
+              f"image generation tasks to {MAX_WORKERS} workers")
         
-        # Collect Image Generation results
-        for future in concurrent.futures.as_completed(image_gen_futures):
-            index, img = future.result()
-            if img:
-                processed_images[index] = img
+        # Collect results as they complete
+        for future in concurrent.futures.as_completed(futures):
+            index, result = future.result()
+            if not result:
+                continue
+            if futures[future] == 'ocr':
+                layouts[index] = result
+            else:
+                processed_images[index] = result
+    
+    # The writer pool has shut down; report write errors per page instead of aborting the run
+    # (the page is still in memory for the output and is regenerated on the next resume)
+    for future, index in write_futures.items():
+        try:
+            future.result()
+        except Exception as e:
+            print(f"  ✗ Failed to save background for page {index+1}: {e}")
+    
+    if extraction_failed:
+        return
     
     # For pages with skipped image generation, use original images
     if args.skip_image_gen:
         for i in range(total_pages):
-            processed_images[i] = images[i]
+            processed_images[i] = images[i].load()
             processed_img_file = os.path.join(processed_images_dir, f'page_{i+1}.png')
-            images[i].save(processed_img_file, format='PNG')
+            # Original pages are already PNG files, copy them instead of re-encoding
+            shutil.copyfile(images[i].path, processed_img_file)
     
     # Save progress
     save_progress(input_path, 2, completed=total_pages, total=total_pages)
@@ -396,8 +557,8 @@ def main():
         print("\n[Step 3/3] Creating PowerPoint presentation...")
         try:
             pages_data = [
-                {'image': img, 'layout': layout}
-                for img, layout in zip(processed_images, layouts)
+                {'image': img, 'layout': layout, 'image_key': key}
+                for img, layout, key in zip(processed_images, layouts, background_keys)
             ]
             create_ppt_from_pages(pages_data, output_path)
             print(f"✓ PowerPoint saved to {output_path}")
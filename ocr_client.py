@@ -1,16 +1,197 @@
 import os
 import json
+import hashlib
+import queue
+import threading
+import collections
+import math
+import functools
+from contextlib import contextmanager
 import cv2
 import numpy as np
 import pytesseract
 import time
 from PIL import Image
-from openai import OpenAI
 from dotenv import load_dotenv
+from utils import json_dumps, json_loads
+
+try:
+    # In-process Tesseract bindings; avoids spawning a tesseract process per page
+    from tesserocr import PyTessBaseAPI, PSM, OEM, RIL, iterate_level
+except ImportError:
+    PyTessBaseAPI = None
 
 # Load environment variables (if any)
 load_dotenv()
 
+TESSERACT_LANG = 'chi_sim+eng'
+
+# Static instructions for AI text merging. Sent verbatim as the leading system message so
+# providers with prompt prefix caching can reuse it; keep anything per-page out of it.
+MERGE_SYSTEM_PROMPT = """You are a text block merging expert. Please analyze the text blocks detected by OCR that the user sends and merge them into meaningful text blocks based on their positions and content.
+
+Instructions:
+1. Merge adjacent text blocks that belong to the same line or paragraph
+2. Calculate the merged bounding box to include all merged blocks
+3. Preserve the original text content exactly
+4. Use the average font information from merged blocks
+5. Return ONLY a valid JSON object of the form {"text_blocks": [...]} holding the merged text blocks in the same format as input
+6. Do not add any additional text or explanations
+7. Do not modify the text content
+8. Ensure the JSON is properly formatted with correct quotes and commas
+9. Do not use any escaped characters incorrectly
+
+Example output format:
+{
+  "text_blocks": [
+    {
+      "text": "完整的句子或段落",
+      "bbox": {"x": 100, "y": 50, "width": 300, "height": 50},
+      "font": {
+        "family": "Arial",
+        "size": 14,
+        "weight": "normal",
+        "color": "#000000"
+      }
+    }
+  ]
+}"""
+
+# AI merge results keyed by a hash of the model and input text blocks
+MERGE_CACHE_DIR = '.merge_cache'
+MERGE_CACHE_TTL = 7 * 86400  # Seconds
+
+# Upper bound on merge response tokens (keep within the model's output limit)
+MERGE_MAX_TOKENS = int(os.getenv('MERGE_MAX_TOKENS', '4096'))
+
+def read_tesserocr_words(api):
+    """
+    Collect word results from a tesserocr API after Recognize().
+    
+    Returns the left/top/width/height/conf/text lists of the pytesseract DICT format,
+    read straight from the result iterator instead of formatting and re-parsing TSV.
+    """
+    words = {column: [] for column in ('left', 'top', 'width', 'height', 'conf', 'text')}
+    iterator = api.GetIterator()
+    if iterator is None:
+        return words
+    for word in iterate_level(iterator, RIL.WORD):
+        bbox = word.BoundingBox(RIL.WORD)
+        if bbox is None:
+            continue
+        x1, y1, x2, y2 = bbox
+        words['left'].append(x1)
+        words['top'].append(y1)
+        words['width'].append(x2 - x1)
+        words['height'].append(y2 - y1)
+        words['conf'].append(word.Confidence(RIL.WORD))
+        words['text'].append(word.GetUTF8Text(RIL.WORD) or '')
+    return words
+
+# Pages are rendered at 2x for the image generation step, which can leave text far
+# taller than Tesseract needs. With OCR_DOWNSCALE=1, pages are downsampled for OCR so
+# typical glyphs end up about this many pixels tall (never below OCR_MIN_SCALE).
+# Off by default: check a document type with OCRClient.compare_downscale() first.
+OCR_DOWNSCALE = os.getenv('OCR_DOWNSCALE', '0') == '1'
+OCR_TARGET_TEXT_HEIGHT = 32
+OCR_MIN_SCALE = 0.5
+
+def estimate_text_height(gray_img):
+    """Estimate the median glyph height of a grayscale page, or None if there is too little text."""
+    # Dark-on-light text becomes the foreground after an inverted Otsu threshold
+    _, binary = cv2.threshold(gray_img, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    _, _, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+    heights = stats[1:, cv2.CC_STAT_HEIGHT]
+    widths = stats[1:, cv2.CC_STAT_WIDTH]
+    # Ignore specks, rules/lines and large graphics
+    glyphs = (heights >= 4) & (heights <= gray_img.shape[0] // 10) & (widths <= heights * 4)
+    if glyphs.sum() < 20:
+        return None
+    return float(np.median(heights[glyphs]))
+
+def downscale_for_ocr(gray_img, enabled=None):
+    """
+    Downsample a page whose text is larger than OCR needs.
+    
+    Args:
+        gray_img: Grayscale page
+        enabled: Override OCR_DOWNSCALE (None uses the setting)
+    
+    Returns:
+        tuple: (image to OCR, scale factor applied relative to gray_img)
+    """
+    if not (OCR_DOWNSCALE if enabled is None else enabled):
+        return gray_img, 1.0
+    text_height = estimate_text_height(gray_img)
+    if text_height is None:
+        return gray_img, 1.0
+    scale = max(OCR_MIN_SCALE, OCR_TARGET_TEXT_HEIGHT / text_height)
+    # Not worth a resize for a marginal reduction
+    if scale > 0.9:
+        return gray_img, 1.0
+    resized = cv2.resize(gray_img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    return resized, scale
+
+def rescale_ocr_results(ocr_results, scale):
+    """Map word boxes from a downsampled OCR image back to page coordinates (in place)."""
+    if scale == 1.0:
+        return ocr_results
+    for column in ('left', 'top', 'width', 'height'):
+        ocr_results[column] = [round(value / scale) for value in ocr_results[column]]
+    return ocr_results
+
+class TesseractPool:
+    """Thread-safe pool of in-process Tesseract engines, created on demand up to `size`."""
+    
+    def __init__(self, size, tessdata_path=None):
+        self.size = size
+        self.tessdata_path = tessdata_path
+        self._idle = queue.Queue()
+        self._created = 0
+        self._lock = threading.Lock()
+    
+    def _create_api(self):
+        kwargs = {'path': self.tessdata_path} if self.tessdata_path else {}
+        return PyTessBaseAPI(lang=TESSERACT_LANG, psm=PSM.AUTO, oem=OEM.DEFAULT, **kwargs)
+    
+    @contextmanager
+    def acquire(self):
+        """Borrow an engine for the duration of a with-block."""
+        try:
+            api = self._idle.get_nowait()
+        except queue.Empty:
+            api = None
+            while api is None:
+                with self._lock:
+                    create = self._created < self.size
+                    if create:
+                        self._created += 1
+                if create:
+                    # Loading traineddata is expensive, so engines are only created when all are busy
+                    try:
+                        api = self._create_api()
+                    except Exception:
+                        # Give the slot back so later callers can retry instead of waiting forever
+                        with self._lock:
+                            self._created -= 1
+                        raise
+                else:
+                    try:
+                        api = self._idle.get(timeout=1)
+                    except queue.Empty:
+                        # Re-check: a failed creation may have freed a slot
+                        pass
+        try:
+            yield api
+        finally:
+            api.Clear()
+            self._idle.put(api)
+
+@functools.lru_cache(maxsize=None)
+def merge_api_config():
+    """Return (api_base, api_key, model) for AI text merging, read from the environment once."""
+    return os.getenv('OPENAI_API_BASE'), os.getenv('OPENAI_API_KEY'), os.getenv('OPENAI_MODEL')
+
 class OCRClient:
     def __init__(self):
         """Initialize OpenCV, Tesseract OCR client, and OpenAI client for text merging."""
@@ -19,23 +200,81 @@ class OCRClient:
         if tesseract_path and os.path.exists(tesseract_path):
             pytesseract.pytesseract.tesseract_cmd = tesseract_path
         
-        # Initialize OpenAI client for text merging
-        api_base = os.getenv('OPENAI_API_BASE')
-        api_key = os.getenv('OPENAI_API_KEY')
-        self.model = os.getenv('OPENAI_MODEL')
-        
-        if api_key:
-            self.openai_client = OpenAI(
-                api_key=api_key,
-                base_url=api_base
-            )
-            print("[DEBUG OCR] OpenAI client initialized for text merging")
+        # Prefer in-process engines (one per CPU so pages can be recognised concurrently)
+        if PyTessBaseAPI:
+            tessdata_path = None
+            if tesseract_path:
+                candidate = os.path.join(os.path.dirname(tesseract_path), 'tessdata')
+                tessdata_path = candidate if os.path.isdir(candidate) else None
+            self.tesseract_pool = TesseractPool(os.cpu_count() or 1, tessdata_path)
+            print("[DEBUG OCR] Using in-process Tesseract (tesserocr)")
         else:
-            self.openai_client = None
+            self.tesseract_pool = None
+        
+        # Per-thread grayscale buffers, reused while consecutive pages share a size
+        self._buffers = threading.local()
+        
+        # The OpenAI client for text merging is created on first use (see openai_client)
+        _, api_key, self.model = merge_api_config()
+        # Ask for JSON mode until the provider rejects it
+        self.merge_json_mode = True
+        if not api_key:
             print("[DEBUG OCR] No OpenAI API key found, skipping text merging")
         
         print("[DEBUG OCR] OCRClient initialized with OpenCV+Tesseract")
     
+    @functools.cached_property
+    def openai_client(self):
+        """OpenAI-compatible client for text merging, or None without an API key."""
+        api_base, api_key, _ = merge_api_config()
+        if not api_key:
+            return None
+        # Imported here so OCR-only runs don't pay for loading the openai package
+        from openai import OpenAI
+        client = OpenAI(
+            api_key=api_key,
+            base_url=api_base
+        )
+        print("[DEBUG OCR] OpenAI client initialized for text merging")
+        return client
+    
+    def gray_buffer(self, shape):
+        """Return this thread's uint8 grayscale buffer for an image of the given (height, width)."""
+        buffer = getattr(self._buffers, 'gray', None)
+        if buffer is None or buffer.shape != shape:
+            buffer = np.empty(shape, dtype=np.uint8)
+            self._buffers.gray = buffer
+        return buffer
+    
+    def merge_cache_path(self, text_blocks):
+        """Return the cache file for a merge of these text blocks under the current merge settings."""
+        api_base, _, _ = merge_api_config()
+        canonical = json.dumps([api_base, self.model, MERGE_SYSTEM_PROMPT, MERGE_MAX_TOKENS, text_blocks],
+                               sort_keys=True, ensure_ascii=False)
+        key = hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+        return os.path.join(MERGE_CACHE_DIR, f'{key}.json')
+    
+    def load_cached_merge(self, cache_file):
+        """Return cached merged blocks, or None if missing or expired."""
+        try:
+            if time.time() - os.path.getmtime(cache_file) > MERGE_CACHE_TTL:
+                return None
+            with open(cache_file, 'rb') as f:
+                return json_loads(f.read())
+        except (OSError, json.JSONDecodeError):
+            return None
+    
+    def store_cached_merge(self, cache_file, merged_blocks):
+        """Write merged blocks to the cache; the rename keeps partial files out of it."""
+        try:
+            os.makedirs(MERGE_CACHE_DIR, exist_ok=True)
+            temp_file = f'{cache_file}.{threading.get_ident()}.tmp'
+            with open(temp_file, 'wb') as f:
+                f.write(json_dumps(merged_blocks))
+            os.replace(temp_file, cache_file)
+        except OSError as e:
+            print(f"[ERROR OCR] Failed to cache merged text blocks: {e}")
+    
     def merge_text_blocks(self, text_blocks):
         """
         Merge detected text blocks into meaningful text blocks using OpenAI.
@@ -49,99 +288,75 @@ class OCRClient:
         if not self.openai_client or not text_blocks:
             return text_blocks
         
+        # Pages with identical OCR output (repeated headers, template slides) reuse the earlier merge
+        cache_file = self.merge_cache_path(text_blocks)
+        cached_blocks = self.load_cached_merge(cache_file)
+        if cached_blocks is not None:
+            print(f"[DEBUG OCR] Using cached merge for {len(text_blocks)} text blocks")
+            return cached_blocks
+        
         max_retries = 3  # Number of retries for AI merge
         
         for attempt in range(max_retries):
             try:
                 print(f"[DEBUG OCR] Merging {len(text_blocks)} text blocks with AI (attempt {attempt+1}/{max_retries})...")
                 
-                # Prepare text blocks for AI input
-                text_blocks_str = json.dumps(text_blocks, ensure_ascii=False, indent=2)
+                # Prepare text blocks for AI input (compact; indentation only costs prompt tokens)
+                text_blocks_str = json_dumps(text_blocks).decode('utf-8')
                 
-                # Use multi-line string with format method to avoid f-string issues
-                prompt = """You are a text block merging expert. Please analyze the following text blocks detected by OCR and merge them into meaningful text blocks based on their positions and content.
-
-Text blocks:
-{text_blocks}
-
-Instructions:
-1. Merge adjacent text blocks that belong to the same line or paragraph
-2. Calculate the merged bounding box to include all merged blocks
-3. Preserve the original text content exactly
-4. Use the average font information from merged blocks
-5. Return ONLY a valid JSON array of merged text blocks in the same format as input
-6. Do not add any additional text or explanations
-7. Do not modify the text content
-8. Ensure the JSON is properly formatted with correct quotes and commas
-9. Do not use any escaped characters incorrectly
-
-Example output format:
-[
-  {{
-    "text": "完整的句子或段落",
-    "bbox": {{"x": 100, "y": 50, "width": 300, "height": 50}},
-    "font": {{
-      "family": "Arial",
-      "size": 14,
-      "weight": "normal",
-      "color": "#000000"
-    }}
-  }}
-]""".format(text_blocks=text_blocks_str)
-                
-                # Call OpenAI-compatible API
-                response = self.openai_client.chat.completions.create(
-                    model=self.model,
-                    messages=[
+                # Merged output is never larger than the input, so bound the response. ~2 chars per
+                # token leaves room for the model indenting its answer even though the input is compact.
+                max_tokens = min(MERGE_MAX_TOKENS, math.ceil((len(text_blocks_str) + 512) / 2))
+                request = {
+                    "model": self.model,
+                    "messages": [
+                        {
+                            "role": "system",
+                            "content": MERGE_SYSTEM_PROMPT
+                        },
                         {
                             "role": "user",
-                            "content": prompt
+                            "content": f"Text blocks:\n{text_blocks_str}"
                         }
                     ],
-                    temperature=0.1  # Lower temperature for more deterministic results
-                    # Removed max_tokens to allow full response
-                )
+                    "temperature": 0.1,  # Lower temperature for more deterministic results
+                    "max_tokens": max_tokens
+                }
+                if self.merge_json_mode:
+                    request["response_format"] = {"type": "json_object"}
+                
+                # Call OpenAI-compatible API
+                response = self.openai_client.chat.completions.create(**request)
                 
                 # Get and parse response
-                content = response.choices[0].message.content
+                choice = response.choices[0]
+                content = choice.message.content
                 print(f"[DEBUG OCR] AI merge response: {content[:500]}...")
                 
-                # Parse JSON from response
+                if choice.finish_reason == 'length':
+                    # A cut-off merge can't be repaired reliably and a retry would hit the same limit
+                    print(f"[ERROR OCR] AI merge response exceeded {max_tokens} tokens, using original text blocks...")
+                    return text_blocks
+                
+                # Providers without JSON mode may still wrap the answer in a code fence
                 if "```json" in content:
                     content = content.split("```json")[1].split("```")[0].strip()
                 elif "```" in content:
                     content = content.split("```")[1].split("```")[0].strip()
                 
-                # Clean up any potential issues
                 content = content.strip()
-                
-                # Try to fix common JSON issues
                 try:
-                    # First attempt with strict mode
-                    merged_blocks = json.loads(content)
+                    merged_blocks = json_loads(content)
                 except json.JSONDecodeError:
-                    # Try with non-strict mode (handles some formatting issues)
-                    try:
-                        merged_blocks = json.loads(content, strict=False)
-                    except json.JSONDecodeError:
-                        # Try to fix truncated JSON by closing open structures
-                        content_fixed = content
-                        
-                        # Count open/close brackets and braces
-                        open_brackets = content_fixed.count('[') - content_fixed.count(']')
-                        open_braces = content_fixed.count('{') - content_fixed.count('}')
-                        
-                        # Close any open structures
-                        if open_braces > 0:
-                            content_fixed += '}' * open_braces
-                        if open_brackets > 0:
-                            content_fixed += ']' * open_brackets
-                        
-                        # Try again with fixed content
-                        print(f"[DEBUG OCR] Attempting to fix truncated JSON (added {open_braces} braces, {open_brackets} brackets)...")
-                        merged_blocks = json.loads(content_fixed, strict=False)
+                    # Non-strict mode tolerates raw control characters inside strings
+                    merged_blocks = json.loads(content, strict=False)
+                if isinstance(merged_blocks, dict):
+                    merged_blocks = merged_blocks["text_blocks"]
+                if not isinstance(merged_blocks, list):
+                    raise ValueError(f"expected a list of text blocks, got {type(merged_blocks).__name__}")
                 print(f"[DEBUG OCR] Merged to {len(merged_blocks)} text blocks")
                 
+                self.store_cached_merge(cache_file, merged_blocks)
                 return merged_blocks
                 
             except json.JSONDecodeError as e:
@@ -152,6 +367,11 @@ Example output format:
                     time.sleep(1)  # Wait 1 second before retry
             except Exception as e:
                 print(f"[ERROR OCR] Failed to merge text blocks (attempt {attempt+1}/{max_retries}): {e}")
+                from openai import BadRequestError
+                if isinstance(e, BadRequestError) and self.merge_json_mode:
+                    # Not every OpenAI-compatible provider supports response_format
+                    print("[DEBUG OCR] Disabling JSON mode for text merging")
+                    self.merge_json_mode = False
                 if attempt < max_retries - 1:
                     print(f"[DEBUG OCR] Retrying text merging...")
                     time.sleep(1)  # Wait 1 second before retry
@@ -160,12 +380,146 @@ Example output format:
         print(f"[ERROR OCR] All {max_retries} attempts failed, using original text blocks...")
         return text_blocks
     
+    def build_layout(self, ocr_results, width, height):
+        """
+        Turn Tesseract word results into merged text blocks.
+        
+        Args:
+            ocr_results: OCR results in pytesseract.image_to_data DICT format
+                (only the left/top/width/height/conf/text lists are used)
+            width, height: Size of the OCR'd image, used to clip bounding boxes
+            
+        Returns:
+            dict: Text layout information (see extract_text_layout)
+        """
+        # Filter and clip all candidate words at once; dicts are only built for survivors
+        texts = [text.strip() for text in ocr_results['text']]
+        confidence = np.asarray(ocr_results['conf'], dtype=np.float64)
+        non_empty = np.fromiter((bool(text) for text in texts), dtype=bool, count=len(texts))
+        
+        # Skip empty text or low confidence results
+        keep = non_empty & (confidence >= 60)
+        print(f"[DEBUG OCR] {int(non_empty.sum())} words recognized, "
+              f"{int((non_empty & ~keep).sum())} skipped for low confidence")
+        
+        # Ensure coordinates are within image bounds
+        x = np.maximum(np.asarray(ocr_results['left'], dtype=np.int64)[keep], 0)
+        y = np.maximum(np.asarray(ocr_results['top'], dtype=np.int64)[keep], 0)
+        w = np.minimum(width - x, np.asarray(ocr_results['width'], dtype=np.int64)[keep])
+        h = np.minimum(height - y, np.asarray(ocr_results['height'], dtype=np.int64)[keep])
+        
+        # Estimate font size based on bounding box height
+        # Approximate conversion: 1 pixel ≈ 0.75 point
+        font_sizes = np.round(h * 0.75, 1)
+        
+        kept_texts = [texts[i] for i in np.flatnonzero(keep)]
+        text_blocks = [
+            {
+                "text": text,
+                "bbox": {
+                    "x": bx,
+                    "y": by,
+                    "width": bw,
+                    "height": bh
+                },
+                "font": {
+                    "family": "Arial",  # Tesseract doesn't provide font family
+                    "size": font_size,
+                    "weight": "normal",  # Tesseract doesn't provide font weight
+                    "color": "#000000"  # Tesseract doesn't provide font color
+                }
+            }
+            # tolist() turns numpy scalars back into plain ints/floats for JSON
+            for text, bx, by, bw, bh, font_size in zip(
+                kept_texts, x.tolist(), y.tolist(), w.tolist(), h.tolist(), font_sizes.tolist()
+            )
+        ]
+        
+        print(f"[DEBUG OCR] Processed {len(text_blocks)} valid text blocks")
+        
+        # Merge text blocks using AI
+        merged_blocks = self.merge_text_blocks(text_blocks)
+        
+        # Return in the expected format
+        layout_data = {
+            "text_blocks": merged_blocks
+        }
+        
+        return layout_data
+
+    def recognize(self, gray_img, downscale=None):
+        """
+        Run Tesseract on a grayscale page and return word results in page coordinates.
+        
+        Args:
+            gray_img: Grayscale page as a 2-D numpy array
+            downscale: Override OCR_DOWNSCALE (None uses the setting)
+            
+        Returns:
+            dict: left/top/width/height/conf/text lists (pytesseract DICT format)
+        """
+        ocr_img, scale = downscale_for_ocr(gray_img, downscale)
+        if scale != 1.0:
+            print(f"[DEBUG OCR] Downsampled to {ocr_img.shape[1]}x{ocr_img.shape[0]} for OCR (scale {scale:.2f})")
+        
+        # Get detailed OCR results with bounding boxes
+        if self.tesseract_pool:
+            with self.tesseract_pool.acquire() as api:
+                api.SetImage(Image.fromarray(ocr_img))
+                # Recognize() releases the GIL, so pages run in parallel across threads
+                api.Recognize()
+                ocr_results = read_tesserocr_words(api)
+        else:
+            # Configure Tesseract for Chinese + English recognition with optimized settings
+            # Use simpler configuration for better Chinese recognition
+            custom_config = r'--oem 3 --psm 3 -l chi_sim+eng '
+            ocr_results = pytesseract.image_to_data(
+                ocr_img, 
+                config=custom_config, 
+                output_type=pytesseract.Output.DICT
+            )
+        
+        print(f"[DEBUG OCR] Tesseract OCR completed, found {len(ocr_results['text'])} text elements")
+        return rescale_ocr_results(ocr_results, scale)
+    
+    def compare_downscale(self, gray_img):
+        """
+        OCR a page at full resolution and with the adaptive downscale, and compare the words.
+        
+        Use this on sample pages before enabling OCR_DOWNSCALE for a kind of document.
+        
+        Args:
+            gray_img: Grayscale page as a 2-D numpy array
+            
+        Returns:
+            dict: scale, full_words, downscaled_words, matching_words and
+                agreement (share of full-resolution words also found after downscaling)
+        """
+        def confident_words(ocr_results):
+            return collections.Counter(
+                text.strip() for text, conf in zip(ocr_results['text'], ocr_results['conf'])
+                if text.strip() and float(conf) >= 60
+            )
+        
+        _, scale = downscale_for_ocr(gray_img, enabled=True)
+        full_words = confident_words(self.recognize(gray_img, downscale=False))
+        downscaled_words = confident_words(self.recognize(gray_img, downscale=True))
+        matching_words = sum((full_words & downscaled_words).values())
+        total = sum(full_words.values())
+        return {
+            "scale": scale,
+            "full_words": total,
+            "downscaled_words": sum(downscaled_words.values()),
+            "matching_words": matching_words,
+            "agreement": matching_words / total if total else 1.0
+        }
+    
     def extract_text_layout(self, image):
         """
         Extract text, positions, and formatting from an image using Tesseract.
         
         Args:
-            image: PIL Image object
+            image: PIL Image object, or a 2-D grayscale numpy array
             
         Returns:
             dict: Text layout information in JSON format
@@ -185,100 +539,29 @@ Example output format:
             }
         """
         try:
-            print(f"[DEBUG OCR] Processing image of size: {image.size} pixels")
-            
-            # Verify image is not corrupt
-            image.verify()
-            image = image.copy()  # Create a fresh copy after verify
-            
-            # Convert PIL Image to numpy array (OpenCV format) and grayscale
-            img_array = np.array(image)
-            gray_img = cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY)
-            
-            # Step 2: Perform OCR with Tesseract
-            # Configure Tesseract for Chinese + English recognition with optimized settings
-            # Use simpler configuration for better Chinese recognition
-            custom_config = r'--oem 3 --psm 3 -l chi_sim+eng '
-            
-            # Get detailed OCR results with bounding boxes
-            ocr_results = pytesseract.image_to_data(
-                gray_img, 
-                config=custom_config, 
-                output_type=pytesseract.Output.DICT
-            )
-            
-            print(f"[DEBUG OCR] Tesseract OCR completed, found {len(ocr_results['text'])} text elements")
-            
-            # Step 3: Process OCR results
-            text_blocks = []
-            height, width = gray_img.shape
-            
-            # Debug: Show all OCR results including confidence scores
-            print(f"[DEBUG OCR] Raw OCR results for page:")
-            for i in range(len(ocr_results['text'])):
-                text = ocr_results['text'][i].strip()
-                confidence = int(ocr_results['conf'][i])
-                
-                # Only show non-empty text results
-                if text:
-                    print(f"[DEBUG OCR]   [{i}] Text: '{text}' | Confidence: {confidence}%")
-                
-                # Skip empty text or low confidence results
-                if not text or confidence < 60:
-                    if text:
-                        print(f"[DEBUG OCR]   Skipping low confidence text: '{text}' (confidence: {confidence}%)")
-                    continue
-                
-                # Get bounding box coordinates
-                x = ocr_results['left'][i]
-                y = ocr_results['top'][i]
-                w = ocr_results['width'][i]
-                h = ocr_results['height'][i]
-                
-                # Ensure coordinates are within image bounds
-                x = max(0, x)
-                y = max(0, y)
-                w = min(width - x, w)
-                h = min(height - y, h)
+            if isinstance(image, np.ndarray) and image.ndim == 2:
+                # Already grayscale (e.g. PageHandle.load_gray()); no conversion needed
+                gray_img = image
+                print(f"[DEBUG OCR] Processing image of size: {(gray_img.shape[1], gray_img.shape[0])} pixels")
+            else:
+                print(f"[DEBUG OCR] Processing image of size: {image.size} pixels")
                 
-                # Estimate font size based on bounding box height
-                # Approximate conversion: 1 pixel ≈ 0.75 point
-                font_size = round(h * 0.75, 1)
-                
-                # Create text block entry
-                text_block = {
-                    "text": text,
-                    "bbox": {
-                        "x": x,
-                        "y": y,
-                        "width": w,
-                        "height": h
-                    },
-                    "font": {
-                        "family": "Arial",  # Tesseract doesn't provide font family
-                        "size": font_size,
-                        "weight": "normal",  # Tesseract doesn't provide font weight
-                        "color": "#000000"  # Tesseract doesn't provide font color
-                    }
-                }
-                
-                print(f"[DEBUG OCR]   Adding text block: '{text}' at position ({x}, {y})")
-                text_blocks.append(text_block)
+                # Convert PIL Image to numpy array (OpenCV format) and grayscale into a reused buffer
+                img_array = np.asarray(image)
+                gray_img = cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY, dst=self.gray_buffer(img_array.shape[:2]))
             
-            print(f"[DEBUG OCR] Processed {len(text_blocks)} valid text blocks")
+            # Pages with large text can be OCR'd at a lower resolution; boxes are mapped back
+            ocr_results = self.recognize(gray_img)
             
-            # Merge text blocks using AI
-            merged_blocks = self.merge_text_blocks(text_blocks)
-            
-            # Return in the expected format
-            layout_data = {
-                "text_blocks": merged_blocks
-            }
-            
-            return layout_data
+            return self.build_layout(ocr_results, gray_img.shape[1], gray_img.shape[0])
             
         except Exception as e:
             print(f"[ERROR OCR] Unexpected error during OCR: {type(e).__name__}: {e}")
             import traceback
             traceback.print_exc()
             return {"text_blocks": []}
+
+@functools.lru_cache(maxsize=None)
+def get_ocr_client():
+    """Return the shared OCRClient, so its Tesseract pool and merge client are created only once."""
+    return OCRClient()
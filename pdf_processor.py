@@ -1,7 +1,38 @@
 import fitz  # PyMuPDF
 from PIL import Image
-import io
+import cv2
+import numpy as np
 import os
+import concurrent.futures
+from dataclasses import dataclass
+
+@dataclass
+class PageHandle:
+    """
+    A page image stored on disk. Only the path and size are kept in memory;
+    pixels are decoded on demand so memory does not grow with the page count.
+    """
+    path: str
+    size: tuple
+
+    def load(self):
+        """Decode the page into a PIL Image."""
+        img = Image.open(self.path)
+        img.load()
+        return img
+
+    def load_gray(self):
+        """Decode the page straight into a grayscale numpy array for OCR."""
+        # np.fromfile + imdecode instead of cv2.imread so non-ASCII paths work on Windows
+        data = np.fromfile(self.path, dtype=np.uint8)
+        return cv2.imdecode(data, cv2.IMREAD_GRAYSCALE)
+
+def pixmap_to_array(pix):
+    """View a PyMuPDF pixmap's raw samples as a numpy array (HxW for gray, HxWxN otherwise)."""
+    arr = np.frombuffer(pix.samples, dtype=np.uint8)
+    if pix.n == 1:
+        return arr.reshape(pix.height, pix.width)
+    return arr.reshape(pix.height, pix.width, pix.n)
 
 def extract_images_from_pdf(pdf_path):
     """
@@ -17,14 +48,55 @@ def extract_images_from_pdf(pdf_path):
         # zoom=2 for better resolution (approx 144 dpi)
         pix = page.get_pixmap(matrix=fitz.Matrix(2, 2)) 
         
-        # Convert to PIL Image
-        img_data = pix.tobytes("png")
-        img = Image.open(io.BytesIO(img_data))
+        # Convert to PIL Image straight from the raw samples (no PNG round-trip)
+        img = Image.fromarray(pixmap_to_array(pix))
         images.append(img)
         print(f"Processed page {i+1}/{len(doc)}")
         
     return images
 
+def _render_page_range(pdf_path, start, end, output_dir):
+    """Render pages [start, end) of a PDF straight to PNG files (runs in a worker process)."""
+    # Each process opens its own Document; PyMuPDF documents must not be shared
+    doc = fitz.open(pdf_path)
+    pages = []
+    for i in range(start, end):
+        pix = doc[i].get_pixmap(matrix=fitz.Matrix(2, 2))
+        img_path = os.path.join(output_dir, f'page_{i+1}.png')
+        pix.save(img_path)
+        pages.append((i, img_path, (pix.width, pix.height)))
+    doc.close()
+    return pages
+
+def get_pdf_page_count(pdf_path):
+    """Return the number of pages in a PDF."""
+    with fitz.open(pdf_path) as doc:
+        return len(doc)
+
+def iter_images_from_pdf_parallel(pdf_path, output_dir, workers=None, chunk_size=4):
+    """
+    Render each page of a PDF to output_dir/page_N.png using a pool of processes,
+    yielding (page_index, PageHandle) as soon as each small range of pages is done.
+    
+    This lets callers start work on early pages while later ones are still being
+    rendered. Pages are written to disk by the workers so no image data crosses
+    process boundaries. Pages arrive roughly, but not strictly, in order.
+    """
+    page_count = get_pdf_page_count(pdf_path)
+    print(f"Extracting images from {pdf_path} (Total pages: {page_count})...")
+    if page_count == 0:
+        return
+    
+    workers = min(workers or os.cpu_count() or 1, page_count)
+    ranges = [(start, min(start + chunk_size, page_count)) for start in range(0, page_count, chunk_size)]
+    
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_render_page_range, pdf_path, start, end, output_dir) for start, end in ranges]
+        for future in concurrent.futures.as_completed(futures):
+            for i, img_path, size in future.result():
+                print(f"Processed page {i+1}/{page_count}")
+                yield i, PageHandle(img_path, size)
+
 def save_images_to_pdf(images, output_path):
     """
     Save a list of PIL Images to a PDF file.
@@ -35,21 +107,9 @@ def save_images_to_pdf(images, output_path):
 
     print(f"Saving {len(images)} images to {output_path}...")
     
-    # Convert all images to RGB (just in case)
-    rgb_images = []
-    for img in images:
-        if img.mode == 'RGBA':
-            img = img.convert('RGB')
-        else:
-            rgb_images.append(img)
-            
-    if rgb_images:
-        rgb_images[0].save(
-            output_path, "PDF", resolution=100.0, save_all=True, append_images=rgb_images[1:]
-        )
-        print("PDF saved successfully.")
-    else:
-        # If for some reason conversion failed or list is empty
-        images[0].convert('RGB').save(
-            output_path, "PDF", resolution=100.0, save_all=True, append_images=[i.convert('RGB') for i in images[1:]]
-        )
+    # Convert everything to RGB in a single pass (RGBA etc. can't be written to PDF)
+    rgb_images = [img if img.mode == 'RGB' else img.convert('RGB') for img in images]
+    rgb_images[0].save(
+        output_path, "PDF", resolution=100.0, save_all=True, append_images=rgb_images[1:]
+    )
+    print("PDF saved successfully.")
@@ -3,13 +3,98 @@ from pptx.util import Inches, Pt
 from pptx.enum.text import PP_ALIGN
 from pptx.dml.color import RGBColor
 from PIL import Image
+import numpy as np
 import io
 import os
+import hashlib
+import logging
+import functools
+import concurrent.futures
+from utils import hash_file
+import collections
+import itertools
 
+logger = logging.getLogger(__name__)
+
+# Default text color, shared instead of re-created for every failed block
+BLACK = RGBColor(0, 0, 0)
+
+# Number of slide backgrounds encoded ahead of the slide being built; bounds the
+# encoded streams held in memory regardless of the page count
+ENCODE_LOOKAHEAD = min(os.cpu_count() or 1, 8)
+
+@functools.lru_cache(maxsize=256)
 def hex_to_rgb(hex_color):
     """Convert hex color to RGB tuple."""
     hex_color = hex_color.lstrip('#')
-    return tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
+    if len(hex_color) != 6:
+        raise ValueError(f"Invalid hex color: {hex_color!r}")
+    value = int(hex_color, 16)
+    return (value >> 16) & 0xff, (value >> 8) & 0xff, value & 0xff
+
+def _image_key(page_data):
+    """Content key of a slide background, so identical backgrounds can share one encoding."""
+    # Prefer a key from the caller, then the file the image was opened from;
+    # only in-memory images pay for copying and hashing their pixels
+    if page_data.get('image_key'):
+        return 'key', page_data['image_key']
+    image = page_data['image']
+    filename = getattr(image, 'filename', '')
+    if filename and os.path.isfile(filename):
+        return 'file', hash_file(filename)
+    return 'pixels', image.mode, image.size, hashlib.blake2b(image.tobytes(), digest_size=16).digest()
+
+def _encode_background(image):
+    """Encode a slide background into an in-memory file for add_picture."""
+    # JPEG is far smaller and faster to encode for scanned/photographic pages;
+    # keep PNG only when there is transparency
+    img_stream = io.BytesIO()
+    if image.mode in ('RGBA', 'LA'):
+        image.save(img_stream, format='PNG')
+    else:
+        image.convert('RGB').save(img_stream, format='JPEG', quality=85, optimize=False, progressive=False)
+    img_stream.seek(0)
+    return img_stream
+
+def _iter_backgrounds(pages_data, executor, added):
+    """
+    Yield (key, future) for each slide background in order, encoding at most
+    ENCODE_LOOKAHEAD slides ahead. Backgrounds already in the deck (`added`: key -> blob)
+    get no future, and duplicates within the window share one encode.
+    """
+    pending = collections.deque()
+    in_flight = {}
+    pages = iter(pages_data)
+    
+    def submit(page_data):
+        image = page_data['image']
+        key = _image_key(page_data)
+        if key in added:
+            future = None
+        elif key in in_flight:
+            future = in_flight[key]
+        else:
+            future = in_flight[key] = executor.submit(_encode_background, image)
+        pending.append((key, future))
+    
+    for page_data in itertools.islice(pages, ENCODE_LOOKAHEAD):
+        submit(page_data)
+    while pending:
+        key, future = pending.popleft()
+        yield key, future
+        # The caller has added this background to the deck; later duplicates reuse its blob
+        in_flight.pop(key, None)
+        for page_data in itertools.islice(pages, 1):
+            submit(page_data)
+
+def _bbox_row(block):
+    """Return a block's bbox as [x, y, width, height], or NaNs if it is malformed."""
+    try:
+        bbox = block.get('bbox', {})
+        return [float(bbox.get('x', 0)), float(bbox.get('y', 0)),
+                float(bbox.get('width', 100)), float(bbox.get('height', 30))]
+    except (AttributeError, TypeError, ValueError):
+        return [np.nan] * 4
 
 def create_ppt_from_pages(pages_data, output_path):
     """
@@ -19,6 +104,8 @@ def create_ppt_from_pages(pages_data, output_path):
         pages_data: List of dicts, each containing:
             - 'image': PIL Image object (background)
             - 'layout': Layout data from OCR (text_blocks)
+            - 'image_key' (optional): Content key of the image; slides with the same
+              key share one encoded background
         output_path: Path to save the PPTX file
     """
     prs = Presentation()
@@ -32,101 +119,113 @@ def create_ppt_from_pages(pages_data, output_path):
         prs.slide_width = Inches(width_px / 96.0)
         prs.slide_height = Inches(height_px / 96.0)
     
-    for i, page_data in enumerate(pages_data):
-        print(f"Creating slide {i+1}/{len(pages_data)}...")
-        
-        image = page_data['image']
-        layout_data = page_data.get('layout', {})
-        
-        # Create blank slide
-        blank_slide_layout = prs.slide_layouts[6]  # Blank layout
-        slide = prs.slides.add_slide(blank_slide_layout)
-        
-        # Add background image
-        img_stream = io.BytesIO()
-        image.save(img_stream, format='PNG')
-        img_stream.seek(0)
-        
-        slide.shapes.add_picture(
-            img_stream,
-            0, 0,
-            width=prs.slide_width,
-            height=prs.slide_height
-        )
-        
-        # Add text blocks
-        text_blocks = layout_data.get('text_blocks', [])
-        for block in text_blocks:
+    # Backgrounds are encoded on a thread pool a few slides ahead (PIL releases the GIL
+    # while encoding); the Presentation itself is not thread-safe, so slides are still
+    # built one by one. Identical backgrounds are only encoded once, and python-pptx
+    # stores byte-identical pictures as a single media part.
+    added = {}  # background key -> image blob already in the deck
+    with concurrent.futures.ThreadPoolExecutor(max_workers=ENCODE_LOOKAHEAD) as executor:
+        backgrounds = _iter_backgrounds(pages_data, executor, added)
+        for i, (page_data, (key, future)) in enumerate(zip(pages_data, backgrounds)):
+            print(f"Creating slide {i+1}/{len(pages_data)}...")
+            
+            image = page_data['image']
+            layout_data = page_data.get('layout', {})
+            
+            # Create blank slide
+            blank_slide_layout = prs.slide_layouts[6]  # Blank layout
+            slide = prs.slides.add_slide(blank_slide_layout)
+            
+            # Add background image; the encoded stream is dropped once it is in the deck
+            img_stream = io.BytesIO(added[key]) if key in added else future.result()
+            picture = slide.shapes.add_picture(
+                img_stream,
+                0, 0,
+                width=prs.slide_width,
+                height=prs.slide_height
+            )
+            # python-pptx keeps this blob for the saved file anyway, so remembering it is free
+            added[key] = picture.image.blob
+            
+            # Add text blocks
+            text_blocks = layout_data.get('text_blocks', [])
+            
+            # Get current image dimensions
+            current_width_px, current_height_px = image.size
+            
+            # Get original image dimensions from layout data; a bad size would break every
+            # block's scaling, so the page keeps its background but loses its text
+            original_size = layout_data.get('original_size') or {}
             try:
-                text = block.get('text', '')
-                bbox = block.get('bbox', {})
-                font_info = block.get('font', {})
-                
-                # Get original image dimensions from layout data
-                original_size = layout_data.get('original_size', {})
-                original_width_px = original_size.get('width', image.size[0])
-                original_height_px = original_size.get('height', image.size[1])
-                
-                # Get current image dimensions
-                current_width_px, current_height_px = image.size
-                
-                # Get original coordinates and size from OCR
-                original_x = bbox.get('x', 0)
-                original_y = bbox.get('y', 0)
-                original_width = bbox.get('width', 100)
-                original_height = bbox.get('height', 30)
-                
-                # Calculate scaling factors
-                scale_x = current_width_px / original_width_px
-                scale_y = current_height_px / original_height_px
-                
-                # Apply scaling to coordinates and dimensions
-                scaled_x = original_x * scale_x
-                scaled_y = original_y * scale_y
-                scaled_width = original_width * scale_x
-                scaled_height = original_height * scale_y
-                
-                print(f"[DEBUG PPT] Original size: {original_width_px}x{original_height_px}")
-                print(f"[DEBUG PPT] Current size: {current_width_px}x{current_height_px}")
-                print(f"[DEBUG PPT] Original: x={original_x}, y={original_y}, w={original_width}, h={original_height}")
-                print(f"[DEBUG PPT] Scaled: x={scaled_x}, y={scaled_y}, w={scaled_width}, h={scaled_height}")
-                print(f"[DEBUG PPT] Scale factors: x={scale_x:.2f}, y={scale_y:.2f}")
-                
-                # Convert scaled pixel coordinates to inches
-                x = Inches(scaled_x / 96.0)
-                y = Inches(scaled_y / 96.0)
-                width = Inches(scaled_width / 96.0)
-                height = Inches(scaled_height / 96.0)
-                
-                # Create text box
-                textbox = slide.shapes.add_textbox(x, y, width, height)
-                text_frame = textbox.text_frame
-                text_frame.word_wrap = True
-                text_frame.clear()
-                
-                p = text_frame.paragraphs[0]
-                p.text = text
-                
-                # Apply font styling
-                font = p.font
-                font.name = font_info.get('family', 'Arial')
-                # Apply scaling to font size (use scale_y for height)                font.size = Pt(font_info.get('size', 12) * scale_y)
-                
-                # Set font weight
-                if font_info.get('weight', 'normal').lower() == 'bold':
-                    font.bold = True
-                
-                # Set font color
-                color_hex = font_info.get('color', '#000000')
-                try:
-                    rgb = hex_to_rgb(color_hex)
-                    font.color.rgb = RGBColor(*rgb)
-                except:
-                    font.color.rgb = RGBColor(0, 0, 0)  # Default to black
-                
-            except Exception as e:
-                print(f"Warning: Failed to add text block: {e}")
+                original_width_px = float(original_size.get('width', current_width_px))
+                original_height_px = float(original_size.get('height', current_height_px))
+                if not (original_width_px > 0 and original_height_px > 0):
+                    raise ValueError("width and height must be positive")
+            except (AttributeError, TypeError, ValueError) as e:
+                print(f"Warning: Skipping text on slide {i+1}, invalid original_size {original_size!r}: {e}")
                 continue
+            
+            # Calculate scaling factors (the same for every block on the slide)
+            scale_x = current_width_px / original_width_px
+            scale_y = current_height_px / original_height_px
+            
+            # Apply scaling to the coordinates and dimensions of all blocks at once
+            original_bboxes = np.array([_bbox_row(block) for block in text_blocks], dtype=np.float64).reshape(-1, 4)
+            scaled_bboxes = original_bboxes * (scale_x, scale_y, scale_x, scale_y)
+            
+            for block, original_bbox, scaled_bbox in zip(text_blocks, original_bboxes.tolist(), scaled_bboxes.tolist()):
+                try:
+                    text = block.get('text', '')
+                    font_info = block.get('font', {})
+                    
+                    original_x, original_y, original_width, original_height = original_bbox
+                    scaled_x, scaled_y, scaled_width, scaled_height = scaled_bbox
+                    if np.isnan(scaled_x):
+                        raise ValueError(f"invalid bbox: {block.get('bbox')!r}")
+                    
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug(
+                            "block %r: %sx%s -> %sx%s, (%s, %s, %s, %s) -> (%.1f, %.1f, %.1f, %.1f)",
+                            text[:20], original_width_px, original_height_px, current_width_px, current_height_px,
+                            original_x, original_y, original_width, original_height,
+                            scaled_x, scaled_y, scaled_width, scaled_height
+                        )
+                    
+                    # Convert scaled pixel coordinates to inches
+                    x = Inches(scaled_x / 96.0)
+                    y = Inches(scaled_y / 96.0)
+                    width = Inches(scaled_width / 96.0)
+                    height = Inches(scaled_height / 96.0)
+                    
+                    # Create text box
+                    textbox = slide.shapes.add_textbox(x, y, width, height)
+                    text_frame = textbox.text_frame
+                    text_frame.word_wrap = True
+                    text_frame.clear()
+                    
+                    p = text_frame.paragraphs[0]
+                    p.text = text
+                    
+                    # Apply font styling
+                    font = p.font
+                    font.name = font_info.get('family', 'Arial')
+                    # Apply scaling to font size (use scale_y for height)                font.size = Pt(font_info.get('size', 12) * scale_y)
+                    
+                    # Set font weight
+                    if font_info.get('weight', 'normal').lower() == 'bold':
+                        font.bold = True
+                    
+                    # Set font color
+                    color_hex = font_info.get('color', '#000000')
+                    try:
+                        rgb = hex_to_rgb(color_hex)
+                        font.color.rgb = RGBColor(*rgb)
+                    except:
+                        font.color.rgb = BLACK  # Default to black
+                    
+                except Exception as e:
+                    print(f"Warning: Failed to add text block: {e}")
+                    continue
     
     # Save presentation
     prs.save(output_path)
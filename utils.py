@@ -1,33 +1,134 @@
-import base64
+try:
+    # SIMD-accelerated drop-in replacement for the stdlib module
+    import pybase64 as base64
+except ImportError:
+    import base64
+import hashlib
+import os
+import json
 from io import BytesIO
 import re
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from PIL import Image
 
-def image_to_base64(image):
+try:
+    # Faster C implementation; orjson.JSONDecodeError subclasses json.JSONDecodeError
+    import orjson
+except ImportError:
+    orjson = None
+
+def json_loads(data):
+    """Parse JSON from str or bytes, using orjson when available."""
+    if orjson:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def json_dumps(obj, indent=False):
+    """Serialize obj to UTF-8 encoded JSON bytes, using orjson when available."""
+    if orjson:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+    return json.dumps(obj, ensure_ascii=False, indent=2 if indent else None).encode('utf-8')
+
+def image_to_base64(image, quality=85, max_dim=None):
+    """Encode an image as base64 JPEG, the compact format the image API accepts.
+
+    If max_dim is given, the image is first downscaled so neither side exceeds it.
+    """
+    if max_dim and max(image.size) > max_dim:
+        image = image.copy()
+        image.thumbnail((max_dim, max_dim), Image.LANCZOS)
+    if image.mode != 'RGB':
+        # JPEG has no alpha channel or palette support
+        image = image.convert('RGB')
     buffered = BytesIO()
-    image.save(buffered, format="JPEG")
+    image.save(buffered, format="JPEG", quality=quality, optimize=False)
     return base64.b64encode(buffered.getvalue()).decode('utf-8')
 
+def image_to_base64_from_path(path, quality=85, max_dim=None):
+    """Base64-encode an image file for upload; JPEG files are sent as-is without decoding."""
+    with Image.open(path) as image:
+        # Image.open only parses the header, so checking the format and size is cheap
+        fits = not max_dim or max(image.size) <= max_dim
+        if image.format == 'JPEG' and image.mode == 'RGB' and fits:
+            with open(path, 'rb') as f:
+                return base64.b64encode(f.read()).decode('utf-8')
+        return image_to_base64(image, quality, max_dim)
+
 def base64_to_image(base64_str):
     return Image.open(BytesIO(base64.b64decode(base64_str)))
 
+def hash_file(path, extra=b''):
+    """Return a hex content hash of a file (plus optional extra bytes), used as a cache key."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        digest.update(f.read())
+    digest.update(extra)
+    return digest.hexdigest()
+
+# Final 12 bytes of every complete PNG: zero-length IEND chunk and its CRC
+PNG_TRAILER = b'\x00\x00\x00\x00IEND\xaeB`\x82'
+
+def png_is_complete(path):
+    """Cheaply check that a PNG file was fully written by looking for its IEND trailer."""
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        if f.tell() < len(PNG_TRAILER):
+            return False
+        f.seek(-len(PNG_TRAILER), os.SEEK_END)
+        return f.read() == PNG_TRAILER
+
+# Find http/https urls (path/query separators / : ? = # ~ ; are listed
+# explicitly since \w does not cover them). re.ASCII keeps \w from matching
+# CJK text that directly follows a URL in the model's reply.
+_URL_RE = re.compile(r'https?://[\w$\-@.&+!*(),%/:?=#~;]+', re.ASCII)
+
 def extract_url_from_text(text):
-    # Find http/https urls
-    urls = re.findall(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+', text)
-    if urls:
+    match = _URL_RE.search(text)
+    if match:
         # Clean up markdown syntax if present (e.g. closing parenthesis)
-        url = urls[0]
-        if url.endswith(')'):
-            url = url[:-1]
-        return url
+        return match.group(0).rstrip(')')
     return None
 
-def download_image_from_url(url):
+def has_complete_url(text):
+    """Return True if text holds a URL followed by more text, so it cannot grow any further."""
+    match = _URL_RE.search(text)
+    return match is not None and match.end() < len(text)
+
+# File extensions for downloaded image formats that can be written to disk as-is
+IMAGE_FORMAT_EXTENSIONS = {'JPEG': '.jpg', 'PNG': '.png'}
+
+# Shared session so repeated downloads reuse keep-alive connections instead of
+# paying a new TCP+TLS handshake per image
+_SESSION = requests.Session()
+_DOWNLOAD_ADAPTER = HTTPAdapter(
+    pool_connections=16,
+    pool_maxsize=32,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504])
+)
+_SESSION.mount('https://', _DOWNLOAD_ADAPTER)
+_SESSION.mount('http://', _DOWNLOAD_ADAPTER)
+
+def download_image_bytes_from_url(url):
+    """Download an image and return its raw bytes with the format detected by PIL (e.g. 'JPEG')."""
+    response = None
     try:
-        response = requests.get(url)
-        if response.status_code == 200:
-            return Image.open(BytesIO(response.content))
+        response = _SESSION.get(url, timeout=(3.05, 30))
+        response.raise_for_status()
+        # Decode fully so a corrupt download fails here instead of being saved and cached
+        img = Image.open(BytesIO(response.content))
+        img.load()
+        return response.content, img.format
     except Exception as e:
         print(f"Error downloading image: {e}")
+    finally:
+        if response is not None:
+            response.close()
+    return None
+
+def download_image_from_url(url):
+    result = download_image_bytes_from_url(url)
+    if result:
+        return Image.open(BytesIO(result[0]))
     return None